@@ -1,11 +1,18 @@
 # main.py  -- A-PLUS 完整版
+import asyncio
+import os
+from concurrent.futures import ThreadPoolExecutor
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
-from pydantic import BaseModel
+from fastapi.responses import ORJSONResponse
+from pydantic import BaseModel, Field
 from datetime import datetime, timedelta, time
-from typing import List, Dict, Any, Optional
+from functools import lru_cache
+from typing import List, Dict, Any, Optional, Tuple
+import numpy as np
+from numba import njit
 
-app = FastAPI()
+app = FastAPI(default_response_class=ORJSONResponse)
 
 app.add_middleware(
     CORSMiddleware,
@@ -20,7 +27,7 @@ app.add_middleware(
 # -------------------------
 class RequestData(BaseModel):
     battery_level: float
-    charger_power: float
+    charger_power: float = Field(ge=0.1)    # kW, rejects zero / negative / implausibly slow
     target_time: str            # "HH:MM"
     cheap_mode: bool = False
     target_soc: float = 80.0
@@ -50,9 +57,14 @@ LOW_PRICE = 0.20
 HIGH_PRICE = 0.40
 BATTERY_CAPACITY_KWH = 50.0
 SLOT_INTERVAL = 0.25            # hours (15 min) — used to build slots sequence
-SIM_SUB_INTERVAL = 5 / 60.0     # hours (5 min) — simulation substep
+SLOT_INTERVAL_SECONDS = SLOT_INTERVAL * 3600.0
 MAX_SCAN_HOURS = 48.0           # safety cap to avoid infinite loops
-MAX_SIM_STEPS = 2000            # safety cap for simulation steps
+EPOCH = datetime(1970, 1, 1)    # naive wall-clock epoch used by the numeric kernels
+
+# taper model as step tables indexed by int(soc): charge rate factor, and the SoC where the factor next changes
+_SOC_GRID = np.arange(101)
+TAPER_LUT = np.where(_SOC_GRID < 80, 1.0, np.where(_SOC_GRID < 90, 0.5, 0.2))
+TAPER_BREAKPOINT_LUT = np.where(_SOC_GRID < 80, 80.0, np.where(_SOC_GRID < 90, 90.0, 100.0))
 
 # -------------------------
 # Helpers
@@ -64,170 +76,345 @@ def is_low_price(dt: datetime) -> bool:
     t = dt.time()
     return (t >= time(22, 0)) or (t < time(2, 0))
 
-def taper_factor(soc: float) -> float:
-    # taper model (same for normal and optimized)
-    if soc < 80.0:
-        return 1.0
-    if soc < 90.0:
-        return 0.5
-    return 0.2
+# same windows as is_low_price, on wall-clock seconds since EPOCH (1970-01-01 was a Thursday)
+@njit(cache=True)
+def _is_low_price_s(epoch_s: float) -> bool:
+    if (epoch_s // 86400 + 3) % 7 >= 5:
+        return True
+    hour = (epoch_s // 3600) % 24
+    return hour >= 22 or hour < 2
+
+# vectorized is_low_price over an array of wall-clock seconds since EPOCH
+def low_price_mask(epoch_s: np.ndarray) -> np.ndarray:
+    weekday = (epoch_s // 86400 + 3) % 7
+    hour = (epoch_s // 3600) % 24
+    return (weekday >= 5) | (hour >= 22) | (hour < 2)
 
 def fmt_hm(dt: datetime) -> str:
     return dt.strftime("%H:%M")
 
-# simulate immediate charging starting at `start_dt` until required_kwh or until we hit end_dt (optional cutoff)
-# returns timeline points (rel/abs/soc), total_hours, final_soc, cost, completed_flag
-def simulate_from_start(
-    current_soc: float,
-    charger_kw: float,
-    required_kwh: float,
-    start_dt: datetime,
-    cutoff_dt: Optional[datetime] = None
-):
+def _wall_seconds(dt: datetime) -> float:
+    return (dt - EPOCH).total_seconds()
+
+# fmt_hm for wall-clock seconds since EPOCH (rounded to the microsecond, like datetime arithmetic)
+def _fmt_hm_s(epoch_s: float) -> str:
+    minutes = int(round(epoch_s, 6) // 60)
+    return f"{minutes // 60 % 24:02d}:{minutes % 60:02d}"
+
+# Slot grid anchored at the quarter hour containing `now`. Tariff windows change on whole hours, so
+# slot i of every request made within that quarter hour has the same price; requests then only slice
+# the cached arrays. Returns (slot offsets in seconds from the quarter, low-price mask, prices), read-only.
+@lru_cache(maxsize=256)
+def _build_slots(now_quarter: int, dep_epoch: int) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    scan_seconds = min(dep_epoch - now_quarter, MAX_SCAN_HOURS * 3600.0)
+    slot_offsets = np.arange(0.0, scan_seconds, SLOT_INTERVAL_SECONDS)
+    low_mask = low_price_mask(now_quarter + slot_offsets)
+    prices = np.where(low_mask, LOW_PRICE, HIGH_PRICE)
+    for arr in (slot_offsets, low_mask, prices):
+        arr.setflags(write=False)
+    return slot_offsets, low_mask, prices
+
+# -------------------------
+# Numeric kernels (Numba) — plain floats/arrays only, datetimes stay in the Python wrappers
+# -------------------------
+# One constant-rate charging step. Taper is piecewise constant (breaks at 80 / 90 % SoC) and prices only
+# change on slot boundaries, so charge straight to whichever comes first: the next taper breakpoint,
+# required_kwh, or max_hours (the caller's next slot boundary / cutoff). Needs charger_kw > 0.
+# Returns (hours, kwh, soc after step).
+@njit(cache=True)
+def _charge_step(soc, remaining_kwh, charger_kw, max_hours):
+    soc_idx = min(max(int(soc), 0), 100)
+    rate = charger_kw * TAPER_LUT[soc_idx]
+    breakpoint_soc = TAPER_BREAKPOINT_LUT[soc_idx]
+    breakpoint_kwh = (breakpoint_soc - soc) / 100.0 * BATTERY_CAPACITY_KWH
+
+    dh = min(breakpoint_kwh / rate, remaining_kwh / rate, max_hours)
+    kwh = rate * dh
+    if kwh >= breakpoint_kwh - 1e-9:
+        # snap onto the breakpoint so the next step starts in the next taper region
+        return dh, breakpoint_kwh, breakpoint_soc
+    return dh, kwh, soc + (kwh / BATTERY_CAPACITY_KWH) * 100.0
+
+# Upper bound on the steps of one simulation, used to size its arrays. Every step ends on a slot
+# boundary, a taper breakpoint (80 / 90 / 100 %), required_kwh or the cutoff, and charging never runs
+# longer than required_kwh at the slowest taper rate: at most one step per slot spanned plus the breakpoints.
+@njit(cache=True)
+def _max_steps(charger_kw, required_kwh, slot_h, limit_h):
+    if charger_kw <= 0:
+        return 0
+    hours = max(min(required_kwh / (charger_kw * TAPER_LUT[100]), limit_h), 0.0)
+    return int(hours / slot_h) + 6
+
+@njit(cache=True, nogil=True)
+def _trajectory_kernel(current_soc, charger_kw, required_kwh, slot_h, limit_h):
+    max_steps = _max_steps(charger_kw, required_kwh, slot_h, limit_h)
+    charge_kwh = np.empty(max_steps)
+    start_hours = np.empty(max_steps)
+    end_hours = np.empty(max_steps)
+    socs = np.empty(max_steps)
+
+    soc = current_soc
+    charged_total = 0.0
+    elapsed = 0.0
+    steps = 0
+    while (charged_total + 1e-9 < required_kwh and soc < 100.0 and charger_kw > 0
+           and elapsed + 1e-9 < limit_h):
+        slot_end = (np.floor(elapsed / slot_h + 1e-9) + 1.0) * slot_h
+        dh, charge_now, soc = _charge_step(
+            soc, required_kwh - charged_total, charger_kw, min(slot_end, limit_h) - elapsed
+        )
+
+        start_hours[steps] = elapsed
+        charged_total += charge_now
+        elapsed += dh
+
+        charge_kwh[steps] = charge_now
+        end_hours[steps] = elapsed
+        socs[steps] = soc
+        steps += 1
+
+    completed = charged_total + 1e-9 >= required_kwh
+    return charge_kwh[:steps], start_hours[:steps], end_hours[:steps], socs[:steps], completed
+
+@njit(cache=True, nogil=True)
+def _sim_kernel(current_soc, charger_kw, required_kwh, start_s, cutoff_s, slot_h):
+    limit_h = (cutoff_s - start_s) / 3600.0
+    # +1: the wall-clock phase can split one more slot than a start-aligned grid would
+    max_steps = _max_steps(charger_kw, required_kwh, slot_h, limit_h) + 1
+    elapsed_points = np.empty(max_steps)
+    soc_points = np.empty(max_steps)
+    # tariffs change on whole hours, so steps break on wall-clock slot boundaries (not ones relative to
+    # start_s) and each step has a single price; phase_h is how far start_s is into its slot
+    phase_h = (start_s % (slot_h * 3600.0)) / 3600.0
+
     soc = current_soc
     charged_total = 0.0
     elapsed = 0.0
     cost = 0.0
-    timeline: List[Dict[str, Any]] = []
+    n_points = 0
+    while (charged_total + 1e-9 < required_kwh and soc < 100.0 and charger_kw > 0
+           and elapsed + 1e-9 < limit_h):
+        slot_end = (np.floor((elapsed + phase_h) / slot_h + 1e-9) + 1.0) * slot_h - phase_h
+        dh, charge_now, soc = _charge_step(
+            soc, required_kwh - charged_total, charger_kw, min(slot_end, limit_h) - elapsed
+        )
 
-    steps = 0
-    while charged_total + 1e-9 < required_kwh and soc < 100.0 and steps < MAX_SIM_STEPS:
-        factor = taper_factor(soc)
-        can_charge = charger_kw * SIM_SUB_INTERVAL * factor
-        charge_now = min(can_charge, required_kwh - charged_total)
-
-        # Determine duration of this sub-interval
-        if charger_kw * factor > 0:
-            partial_hours = charge_now / (charger_kw * factor)
+        # price at the step midpoint, safely inside its slot
+        point_s = start_s + (elapsed + dh / 2.0) * 3600.0
+        charged_total += charge_now
+        elapsed += dh
+        if _is_low_price_s(point_s):
+            cost += charge_now * LOW_PRICE
         else:
-            partial_hours = SIM_SUB_INTERVAL
+            cost += charge_now * HIGH_PRICE
 
-        charged_total += charge_now
-        soc += (charge_now / BATTERY_CAPACITY_KWH) * 100.0
-        soc = min(100.0, soc)
-        elapsed += partial_hours
+        elapsed_points[n_points] = elapsed
+        soc_points[n_points] = soc
+        n_points += 1
 
-        point_dt = start_dt + timedelta(hours=elapsed)
+    completed = charged_total + 1e-9 >= required_kwh
+    return elapsed_points[:n_points], soc_points[:n_points], elapsed, soc, cost, completed
 
-        # cutoff rule
-        if cutoff_dt is not None and point_dt > cutoff_dt:
-            break
+# cost-only variant of _sim_kernel without cutoff (the immediate-charging baseline): no timeline arrays
+@njit(cache=True, nogil=True)
+def _sim_cost_kernel(current_soc, charger_kw, required_kwh, start_s, slot_h):
+    phase_h = (start_s % (slot_h * 3600.0)) / 3600.0
 
-        # correct dynamic pricing for normal charging
-        if is_low_price(point_dt):
+    soc = current_soc
+    charged_total = 0.0
+    elapsed = 0.0
+    cost = 0.0
+    while charged_total + 1e-9 < required_kwh and soc < 100.0 and charger_kw > 0:
+        slot_end = (np.floor((elapsed + phase_h) / slot_h + 1e-9) + 1.0) * slot_h - phase_h
+        dh, charge_now, soc = _charge_step(soc, required_kwh - charged_total, charger_kw, slot_end - elapsed)
+
+        point_s = start_s + (elapsed + dh / 2.0) * 3600.0
+        charged_total += charge_now
+        elapsed += dh
+        if _is_low_price_s(point_s):
             cost += charge_now * LOW_PRICE
         else:
             cost += charge_now * HIGH_PRICE
 
-        timeline.append({
-            "rel_time": f"+{elapsed:.2f}h",
-            "abs_time": fmt_hm(point_dt),
-            "soc": round(soc, 1)
-        })
+    return cost, elapsed
 
-        steps += 1
+# simulate immediate charging starting at `start_dt` until required_kwh or until we hit end_dt (optional cutoff)
+# returns raw timeline arrays (elapsed hours / soc per point), total_hours, final_soc, cost, completed_flag;
+# all at full precision, rounding is left to the response
+def simulate_from_start(
+    current_soc: float,
+    charger_kw: float,
+    required_kwh: float,
+    start_dt: datetime,
+    cutoff_dt: Optional[datetime] = None
+):
+    start_s = _wall_seconds(start_dt)
+    cutoff_s = _wall_seconds(cutoff_dt) if cutoff_dt is not None else np.inf
+    elapsed_points, soc_points, elapsed, soc, cost, completed = _sim_kernel(
+        float(current_soc), float(charger_kw), float(required_kwh),
+        start_s, cutoff_s, SLOT_INTERVAL
+    )
 
-    completed = charged_total + 1e-9 >= required_kwh
     return {
-        "timeline": timeline,
-        "hours": round(elapsed, 2),
-        "final_soc": round(soc, 1),
-        "cost": round(cost, 2),
+        "elapsed_points": elapsed_points,
+        "soc_points": soc_points,
+        "hours": elapsed,
+        "final_soc": soc,
+        "cost": cost,
         "completed": completed
     }
 
 
-# Evaluate charging plan that starts at a given slot index: greedily fill each slot (using sub-intervals),
-# respecting taper and slot time length, stopping once required_kwh satisfied or departure reached.
-def evaluate_start_index(
+# baseline cost of charging immediately from `start_dt` (no cutoff); returns cost and hours only
+def simulate_cost(
     current_soc: float,
     charger_kw: float,
     required_kwh: float,
-    slots: List[Dict[str, Any]],
-    start_idx: int,
-    slot_interval_hours: float,
-    sim_sub_interval: float,
-    departure_dt: datetime
+    start_dt: datetime
+) -> Dict[str, float]:
+    cost, elapsed = _sim_cost_kernel(
+        float(current_soc), float(charger_kw), float(required_kwh),
+        _wall_seconds(start_dt), SLOT_INTERVAL
+    )
+    return {"cost": cost, "hours": elapsed}
+
+
+# Format raw timeline arrays into rel/abs/soc points. Only called for the plan that is returned,
+# so candidate plans never pay for string formatting.
+def format_timeline(start_s: float, elapsed_points: np.ndarray, soc_points: np.ndarray) -> List[Dict[str, Any]]:
+    minutes = (np.round(start_s + elapsed_points * 3600.0, 6) // 60).astype(np.int64)
+    hh = (minutes // 60 % 24).tolist()
+    mm = (minutes % 60).tolist()
+    socs = np.round(soc_points, 1).tolist()
+    return [
+        {"rel_time": f"+{e:.2f}h", "abs_time": f"{h:02d}:{m:02d}", "soc": s}
+        for e, h, m, s in zip(elapsed_points.tolist(), hh, mm, socs)
+    ]
+
+
+# Simulate the charging curve once, independent of wall-clock time. Taper depends only on SoC
+# (i.e. on cumulative kWh charged), so every candidate start index shares this same trajectory;
+# only the time-of-use price applied to each step differs between starts. Steps end on slot
+# boundaries relative to the charging start, which are slot boundaries for every start index.
+# The trajectory stops after MAX_SCAN_HOURS, longer than any departure window, so a slow charger
+# cannot size its arrays past that horizon.
+def charge_trajectory(
+    current_soc: float,
+    charger_kw: float,
+    required_kwh: float
 ) -> Dict[str, Any]:
-    soc = current_soc
-    required_remaining = required_kwh
-    timeline: List[Dict[str, Any]] = []
-    elapsed_from_start = 0.0
-    cost = 0.0
-    steps = 0
+    charge_kwh, start_hours, end_hours, socs, completed = _trajectory_kernel(
+        float(current_soc), float(charger_kw), float(required_kwh), SLOT_INTERVAL, MAX_SCAN_HOURS
+    )
+    return {
+        "charge_kwh": charge_kwh,
+        "start_hours": start_hours,
+        "end_hours": end_hours,
+        "soc": socs,
+        "completed": completed
+    }
+
 
-    charging_start_dt = slots[start_idx]["time"]
-
-    n = len(slots)
-    for i in range(start_idx, n):
-        slot = slots[i]
-        slot_dt = slot["time"]
-        slot_price = slot["price"]
-
-        # simulate within this slot using sim_sub_interval slices
-        slot_time_consumed = 0.0
-        max_substeps = int(slot_interval_hours / sim_sub_interval) + 2
-        sub = 0
-        while required_remaining > 1e-9 and sub < max_substeps and steps < MAX_SIM_STEPS:
-            # compute taper
-            factor = taper_factor(soc)
-            can_sub = charger_kw * sim_sub_interval * factor
-            charge_now = min(can_sub, required_remaining)
-            if charger_kw * factor > 0:
-                dh = charge_now / (charger_kw * factor)
-            else:
-                dh = sim_sub_interval
-
-            # if charging over this substep would pass departure cutoff -> stop and return incomplete
-            point_abs_time = charging_start_dt + timedelta(hours=elapsed_from_start + dh)
-            if point_abs_time > departure_dt:
-                # cannot finish in this slot before departure; stop here and return incomplete plan
-                return {
-                    "timeline": timeline,
-                    "hours": round(elapsed_from_start, 2),
-                    "final_soc": round(soc, 1),
-                    "cost": round(cost, 2),
-                    "completed": False,
-                    "start_dt": charging_start_dt
-                }
-
-            # apply
-            required_remaining -= charge_now
-            elapsed_from_start += dh
-            soc += (charge_now / BATTERY_CAPACITY_KWH) * 100.0
-            soc = min(100.0, soc)
-            cost += charge_now * slot_price
-
-            abs_time = charging_start_dt + timedelta(hours=elapsed_from_start)
-            timeline.append({
-                "rel_time": f"+{elapsed_from_start:.2f}h",
-                "abs_time": fmt_hm(abs_time),
-                "soc": round(soc, 1)
-            })
-
-            sub += 1
-            steps += 1
-
-            # if we've satisfied required -> break
-            if required_remaining <= 1e-9:
-                break
-
-    # after iterating scheduled slots, if required_remaining still > 0 => did not complete before departure
-    completed = required_remaining <= 1e-9
+# Evaluate every start index in one fused kernel. There are at most a day of slots (96 starts), too few to
+# be worth parallel threads; concurrent requests already run side by side on _cpu_pool.
+# A plan starting at slot s replays the shared trajectory, paying prices[s + slot offset] for each step.
+# Steps that would end after departure are dropped and the step in progress at departure is charged
+# pro rata up to it (the rate is constant within a step). night_used marks plans that charge any kWh in a
+# low-price slot.
+@njit(cache=True, nogil=True)
+def _evaluate_all_starts(current_soc, charge_kwh, start_hours, end_hours, socs, traj_completed,
+                         prices, low_mask, window_hours, slot_h):
+    n = len(prices)
+    m = len(charge_kwh)
+    slot_offsets = np.floor(start_hours / slot_h + 1e-9).astype(np.int64)
+
+    costs = np.zeros(n)
+    completed = np.zeros(n, dtype=np.bool_)
+    final_socs = np.empty(n)
+    hours = np.empty(n)
+    n_points = np.zeros(n, dtype=np.int64)
+    partial = np.zeros(n, dtype=np.bool_)
+    night_used = np.zeros(n, dtype=np.bool_)
+    for s in range(n):
+        window = window_hours[s]
+        cost = 0.0
+        night = False
+        soc = current_soc
+        elapsed = 0.0
+        k = 0
+        while k < m and end_hours[k] <= window + 1e-9:
+            cost += charge_kwh[k] * prices[s + slot_offsets[k]]
+            night = night or (charge_kwh[k] > 0 and low_mask[s + slot_offsets[k]])
+            soc = socs[k]
+            elapsed = end_hours[k]
+            k += 1
+
+        if k < m and window > start_hours[k]:
+            frac = (window - start_hours[k]) / (end_hours[k] - start_hours[k])
+            cost += frac * charge_kwh[k] * prices[min(s + slot_offsets[k], n - 1)]
+            night = night or (charge_kwh[k] > 0 and low_mask[min(s + slot_offsets[k], n - 1)])
+            soc += frac * (socs[k] - soc)
+            elapsed = window
+            partial[s] = True
+
+        costs[s] = cost
+        completed[s] = k == m and traj_completed
+        final_socs[s] = soc
+        hours[s] = elapsed
+        n_points[s] = k
+        night_used[s] = night
+
+    return costs, completed, final_socs, hours, n_points, partial, night_used
+
+# Returns per-start arrays (cost, completed, final_soc, hours, n_points, partial, night_used) for the shared trajectory.
+def evaluate_all_starts(
+    current_soc: float,
+    trajectory: Dict[str, Any],
+    prices: np.ndarray,
+    low_mask: np.ndarray,
+    window_hours: np.ndarray
+) -> Dict[str, np.ndarray]:
+    costs, completed, final_socs, hours, n_points, partial, night_used = _evaluate_all_starts(
+        float(current_soc), trajectory["charge_kwh"], trajectory["start_hours"], trajectory["end_hours"],
+        trajectory["soc"], trajectory["completed"], prices, low_mask, window_hours, SLOT_INTERVAL
+    )
     return {
-        "timeline": timeline,
-        "hours": round(elapsed_from_start, 2),
-        "final_soc": round(soc, 1),
-        "cost": round(cost, 2),
+        "cost": costs,
         "completed": completed,
-        "start_dt": charging_start_dt
+        "final_soc": final_socs,
+        "hours": hours,
+        "n_points": n_points,
+        "partial": partial,
+        "night_used": night_used
     }
 
 # -------------------------
 # Endpoint
 # -------------------------
+# PREDICT_THREADS sets the planning pool size; unset, ThreadPoolExecutor sizes it from the CPU count.
+# With several uvicorn workers, set it so workers x threads stays near the core count.
+def _predict_threads() -> Optional[int]:
+    raw = os.environ.get("PREDICT_THREADS")
+    if raw is None:
+        return None
+    try:
+        threads = int(raw)
+    except ValueError:
+        raise ValueError(f"PREDICT_THREADS must be a positive integer, got {raw!r}")
+    if threads < 1:
+        raise ValueError(f"PREDICT_THREADS must be a positive integer, got {raw!r}")
+    return threads
+
+# CPU-bound planning gets its own pool instead of sharing (and blocking) the default threadpool;
+# with the GIL released in the kernels, requests scale across cores.
+_cpu_pool = ThreadPoolExecutor(max_workers=_predict_threads(), thread_name_prefix="predict")
+
 @app.post("/predict", response_model=PredictResponse)
-def predict(data: RequestData):
+async def predict(data: RequestData):
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_cpu_pool, plan_charging, data)
+
+def plan_charging(data: RequestData) -> PredictResponse:
     now = datetime.now()
 
     # parse departure
@@ -246,10 +433,10 @@ def predict(data: RequestData):
 
     # Already at/above target
     if required_kwh <= 0:
-        return PredictResponse(
+        return PredictResponse.model_construct(
             hours=0.0,
             final_battery=current_soc,
-            timeline=[TimelinePoint(rel_time="+0.00h", abs_time=fmt_hm(now), soc=round(current_soc,1))],
+            timeline=[TimelinePoint.model_construct(rel_time="+0.00h", abs_time=fmt_hm(now), soc=round(current_soc,1))],
             start_time=fmt_hm(now),
             end_time=fmt_hm(departure_dt),
             cost_now=0.0,
@@ -260,124 +447,112 @@ def predict(data: RequestData):
             info="Already at or above target SOC"
         )
 
-    # build slots between now and departure at SLOT_INTERVAL granularity
-    slots: List[Dict[str, Any]] = []
-    t = now
-    max_steps = int(MAX_SCAN_HOURS / SLOT_INTERVAL)
-    steps = 0
-    while t < departure_dt and steps < max_steps:
-        slots.append({"time": t, "price": LOW_PRICE if is_low_price(t) else HIGH_PRICE})
-        t += timedelta(hours=SLOT_INTERVAL)
-        steps += 1
+    # build slots between now and departure at SLOT_INTERVAL granularity (slot start times as epoch seconds)
+    now_s = _wall_seconds(now)
+    departure_s = _wall_seconds(departure_dt)
+    now_quarter = int(now_s) // int(SLOT_INTERVAL_SECONDS) * int(SLOT_INTERVAL_SECONDS)
+    slot_offsets, low_mask, prices = _build_slots(now_quarter, int(departure_s))
+    n = int(np.searchsorted(slot_offsets, departure_s - now_s, side="left"))
+    slot_epochs = now_s + slot_offsets[:n]
+    low_mask = low_mask[:n]
+    prices = prices[:n]
 
     # If no slots (very short window), fallback to immediate simulation but cut at departure
-    if len(slots) == 0:
+    if len(slot_epochs) == 0:
         sim = simulate_from_start(current_soc, data.charger_power, required_kwh, now, cutoff_dt=departure_dt)
-        meets = (now + timedelta(hours=sim["hours"])) <= departure_dt
-        return PredictResponse(
-            hours=sim["hours"],
-            final_battery=sim["final_soc"],
-            timeline=[TimelinePoint(rel_time=p["rel_time"], abs_time=p["abs_time"], soc=p["soc"]) for p in sim["timeline"]],
+        hours = round(sim["hours"], 2)
+        cost = round(sim["cost"], 2)
+        end_s = now_s + hours * 3600.0
+        meets = sim["completed"]
+        return PredictResponse.model_construct(
+            hours=hours,
+            final_battery=round(sim["final_soc"], 1),
+            timeline=[
+                TimelinePoint.model_construct(rel_time=p["rel_time"], abs_time=p["abs_time"], soc=p["soc"])
+                for p in format_timeline(now_s, sim["elapsed_points"], sim["soc_points"])
+            ],
             start_time=fmt_hm(now),
-            end_time=fmt_hm(now + timedelta(hours=sim["hours"])),
-            cost_now=sim["cost"],
-            cost_optimized=sim["cost"],
+            end_time=_fmt_hm_s(end_s),
+            cost_now=cost,
+            cost_optimized=cost,
             savings=0.0,
             meets_departure=meets,
-            night_tariff_applied=any(is_low_price(sl["time"]) for sl in slots),
+            night_tariff_applied=bool(low_mask.any()),
             info="Very short window; simulated immediate charging with cutoff"
         )
 
     # ------------------ NORMAL (no optimization) ------------------
     if not data.cheap_mode:
         sim = simulate_from_start(current_soc, data.charger_power, required_kwh, now, cutoff_dt=departure_dt)
-        meets = (now + timedelta(hours=sim["hours"])) <= departure_dt
+        hours = round(sim["hours"], 2)
+        end_s = now_s + hours * 3600.0
+        meets = sim["completed"]
         # cost_now baseline: simulate immediate without cutoff for accurate baseline (but here we used cutoff)
-        cost_now = sim["cost"]
-        return PredictResponse(
-            hours=sim["hours"],
-            final_battery=sim["final_soc"],
-            timeline=[TimelinePoint(rel_time=p["rel_time"], abs_time=p["abs_time"], soc=p["soc"]) for p in sim["timeline"]],
+        cost_now = round(sim["cost"], 2)
+        return PredictResponse.model_construct(
+            hours=hours,
+            final_battery=round(sim["final_soc"], 1),
+            timeline=[
+                TimelinePoint.model_construct(rel_time=p["rel_time"], abs_time=p["abs_time"], soc=p["soc"])
+                for p in format_timeline(now_s, sim["elapsed_points"], sim["soc_points"])
+            ],
             start_time=fmt_hm(now),
-            end_time=fmt_hm(now + timedelta(hours=sim["hours"])),
-            cost_now=round(cost_now, 2),
-            cost_optimized=round(cost_now, 2),
+            end_time=_fmt_hm_s(end_s),
+            cost_now=cost_now,
+            cost_optimized=cost_now,
             savings=0.0,
             meets_departure=meets,
-            night_tariff_applied=any(is_low_price(sl["time"]) for sl in slots),
+            night_tariff_applied=bool(low_mask.any()),
             info="Normal immediate charging (no cost optimization)"
         )
 
-    # ------------------ CHEAP MODE: enumerate start indices and pick best feasible plan ------------------
-    best_plan: Optional[Dict[str, Any]] = None
-    n = len(slots)
-    for start_idx in range(n):
-        # Candidate must start at or after now (slots built from now) so that's fine
-        plan = evaluate_start_index(
-            current_soc=current_soc,
-            charger_kw=data.charger_power,
-            required_kwh=required_kwh,
-            slots=slots,
-            start_idx=start_idx,
-            slot_interval_hours=SLOT_INTERVAL,
-            sim_sub_interval=SIM_SUB_INTERVAL,
-            departure_dt=departure_dt
-        )
-        # Only accept plans that are completed before departure
-        if plan["completed"]:
-            # cost baseline for plan comparison is plan["cost"]
-            if best_plan is None or plan["cost"] < best_plan["cost"]:
-                best_plan = plan
-
-    # If no feasible plan completes before departure, allow plans that maximize fill before departure:
-    if best_plan is None:
-        # Evaluate all starts but pick the one that reaches the highest final SOC (tie-breaker: lower cost)
-        candidate_plans = []
-        for start_idx in range(n):
-            plan = evaluate_start_index(
-                current_soc=current_soc,
-                charger_kw=data.charger_power,
-                required_kwh=required_kwh,
-                slots=slots,
-                start_idx=start_idx,
-                slot_interval_hours=SLOT_INTERVAL,
-                sim_sub_interval=SIM_SUB_INTERVAL,
-                departure_dt=departure_dt
-            )
-            candidate_plans.append(plan)
+    # ------------------ CHEAP MODE: evaluate all start indices and pick best feasible plan ------------------
+    # cost_now baseline: immediate charging without cutoff, priced at wall-clock tariffs like the normal
+    # mode (cost only, no timeline). Not start index 0 of the shared trajectory: candidates pay slot-start
+    # tariffs on a grid anchored at `now`, which differs whenever a step straddles a tariff change.
+    cost_now = simulate_cost(current_soc, data.charger_power, required_kwh, now)["cost"]
+    window_hours = (departure_s - slot_epochs) / 3600.0
+    trajectory = charge_trajectory(current_soc, data.charger_power, required_kwh)
+    plans = evaluate_all_starts(current_soc, trajectory, prices, low_mask, window_hours)
+    costs = np.round(plans["cost"], 2)
+
+    # Only accept plans that are completed before departure; ties go to the earliest start
+    if plans["completed"].any():
+        best_idx = int(np.argmin(np.where(plans["completed"], costs, np.inf)))
+    else:
+        # If no feasible plan completes before departure, allow plans that maximize fill before departure:
         # choose plan with largest final_soc; tie-breaker: lower cost; tie-breaker: earliest start
-        candidate_plans_sorted = sorted(candidate_plans, key=lambda p: (-p["final_soc"], p["cost"], p.get("start_dt", now)))
-        best_plan = candidate_plans_sorted[0]
+        final_socs = np.round(plans["final_soc"], 1)
+        best_idx = int(np.lexsort((slot_epochs, costs, -final_socs))[0])
+
+    start_s = float(slot_epochs[best_idx])
+    n_points = int(plans["n_points"][best_idx])
+    elapsed_points = trajectory["end_hours"][:n_points]
+    soc_points = trajectory["soc"][:n_points]
+    if plans["partial"][best_idx]:
+        # plan stops part-way through a step at departure
+        elapsed_points = np.append(elapsed_points, plans["hours"][best_idx])
+        soc_points = np.append(soc_points, plans["final_soc"][best_idx])
+    best_plan = {
+        "elapsed_points": elapsed_points,
+        "soc_points": soc_points,
+        "hours": float(plans["hours"][best_idx]),
+        "final_soc": float(plans["final_soc"][best_idx]),
+        "cost": float(plans["cost"][best_idx]),
+        "completed": bool(plans["completed"][best_idx]),
+        "start_s": start_s,
+        "end_s": start_s + float(plans["hours"][best_idx]) * 3600.0
+    }
 
     # build final response fields from best_plan
-    timeline = best_plan["timeline"]
-    hours = best_plan["hours"]
-    final_soc = best_plan["final_soc"]
-    cost_opt = best_plan["cost"]
-    start_dt = best_plan["start_dt"]
-    cost_now = simulate_from_start(current_soc, data.charger_power, required_kwh, now)["cost"]
-
-    # Fix: compute end_dt from timeline last abs_time with day rollover
-    if len(timeline) > 0:
-        last_abs = timeline[-1]["abs_time"]  # "HH:MM"
-        hh, mm = map(int, last_abs.split(":"))
-        end_dt = start_dt.replace(hour=hh, minute=mm, second=0, microsecond=0)
-        if end_dt < start_dt:
-            end_dt += timedelta(days=1)
-    else:
-        end_dt = start_dt
-
-    # night tariff applied check — whether any timeline point falls into low-price period
-    night_flag = False
-    for p in timeline:
-        hh, mm = map(int, p["abs_time"].split(":"))
-        cand = start_dt.replace(hour=hh, minute=mm, second=0, microsecond=0)
-        # if cand < start_dt assume next day if necessary
-        if cand < start_dt:
-            cand += timedelta(days=1)
-        if is_low_price(cand):
-            night_flag = True
-            break
+    timeline = format_timeline(best_plan["start_s"], best_plan["elapsed_points"], best_plan["soc_points"])
+    hours = round(best_plan["hours"], 2)
+    final_soc = round(best_plan["final_soc"], 1)
+    cost_now = round(cost_now, 2)
+    cost_opt = round(best_plan["cost"], 2)
+
+    # night tariff applied check — whether the plan charged anything in a low-price slot
+    night_flag = bool(plans["night_used"][best_idx])
 
     meets_departure = best_plan["completed"]
 
@@ -385,14 +560,14 @@ def predict(data: RequestData):
     if not best_plan.get("completed", False):
         info = "Cannot reach target SOC before departure; returning maximal fill plan before departure."
 
-    return PredictResponse(
-        hours=round(hours, 2),
-        final_battery=round(final_soc, 1),
-        timeline=[TimelinePoint(rel_time=p["rel_time"], abs_time=p["abs_time"], soc=p["soc"]) for p in timeline],
-        start_time=fmt_hm(start_dt),
-        end_time=fmt_hm(end_dt),
-        cost_now=round(cost_now, 2),
-        cost_optimized=round(cost_opt, 2),
+    return PredictResponse.model_construct(
+        hours=hours,
+        final_battery=final_soc,
+        timeline=[TimelinePoint.model_construct(rel_time=p["rel_time"], abs_time=p["abs_time"], soc=p["soc"]) for p in timeline],
+        start_time=_fmt_hm_s(best_plan["start_s"]),
+        end_time=_fmt_hm_s(best_plan["end_s"]),
+        cost_now=cost_now,
+        cost_optimized=cost_opt,
         savings=round(max(cost_now - cost_opt, 0.0), 2),
         meets_departure=meets_departure,
         night_tariff_applied=night_flag,
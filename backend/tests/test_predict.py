@@ -0,0 +1,126 @@
+# Regression tests for /predict: normal and cheap mode against a brute-force 1-second reference model.
+import sys
+from datetime import datetime, timedelta
+from pathlib import Path
+
+import numpy as np
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "app"))
+import main  # noqa: E402
+
+REF_STEP_S = 1.0
+MAX_REF_S = 24 * 3600
+
+
+def _frozen(now: datetime):
+    class FrozenDatetime(datetime):
+        @classmethod
+        def now(cls, tz=None):
+            return now
+    return FrozenDatetime
+
+
+def _plan(monkeypatch, now: datetime, **request) -> dict:
+    monkeypatch.setattr(main, "datetime", _frozen(now))
+    return main.plan_charging(main.RequestData(**request)).model_dump()
+
+
+# Reference trajectory in fixed 1-second steps, taper read at the start of each step.
+# Returns per-step kWh and step start (seconds from charging start), and whether required_kwh was reached.
+def _reference_trajectory(soc, charger_kw, required_kwh):
+    step_kwh, step_start = [], []
+    charged, t = 0.0, 0.0
+    while charged < required_kwh - 1e-12 and soc < 100.0 and t < MAX_REF_S:
+        factor = 1.0 if soc < 80 else 0.5 if soc < 90 else 0.2
+        rate = charger_kw * factor
+        kwh = min(rate * REF_STEP_S / 3600.0, required_kwh - charged)
+        step_kwh.append(kwh)
+        step_start.append(t)
+        charged += kwh
+        soc += kwh / main.BATTERY_CAPACITY_KWH * 100.0
+        t += kwh / rate * 3600.0
+    return np.array(step_kwh), np.array(step_start), t, charged >= required_kwh - 1e-9
+
+
+def _prices(epoch: np.ndarray) -> np.ndarray:
+    ts = epoch.astype("datetime64[s]")
+    hour = ts.astype("datetime64[h]").astype(np.int64) % 24
+    weekday = (ts.astype("datetime64[D]").astype(np.int64) + 3) % 7     # 1970-01-01 was a Thursday
+    low = (weekday >= 5) | (hour >= 22) | (hour < 2)
+    return np.where(low, main.LOW_PRICE, main.HIGH_PRICE)
+
+
+def _epoch(dt: datetime) -> float:
+    return (dt - datetime(1970, 1, 1)).total_seconds()
+
+
+def _departure(now: datetime, hhmm: str) -> datetime:
+    h, m = map(int, hhmm.split(":"))
+    dep = now.replace(hour=h, minute=m, second=0, microsecond=0)
+    return dep if dep > now else dep + timedelta(days=1)
+
+
+# `now` sits on quarter hours so slot-start and wall-clock tariffs coincide for every candidate start
+NOWS = [datetime(2025, 3, 5, 18, 0), datetime(2025, 3, 7, 21, 45), datetime(2025, 3, 5, 1, 30)]
+REQUESTS = [
+    dict(battery_level=20, charger_power=7.4, target_soc=80, target_time="07:00"),
+    dict(battery_level=20, charger_power=3.7, target_soc=100, target_time="07:00"),
+    dict(battery_level=70, charger_power=22, target_soc=100, target_time="06:00"),
+    dict(battery_level=85, charger_power=11, target_soc=95, target_time="23:30"),
+    dict(battery_level=10, charger_power=3.7, target_soc=90, target_time="03:00"),
+]
+
+
+@pytest.mark.parametrize("now", NOWS)
+@pytest.mark.parametrize("request_kwargs", REQUESTS)
+def test_normal_mode_matches_reference(monkeypatch, now, request_kwargs):
+    result = _plan(monkeypatch, now, cheap_mode=False, **request_kwargs)
+
+    soc = request_kwargs["battery_level"]
+    required = (request_kwargs["target_soc"] - soc) / 100.0 * main.BATTERY_CAPACITY_KWH
+    window_s = (_departure(now, request_kwargs["target_time"]) - now).total_seconds()
+    step_kwh, step_start, total_s, completed = _reference_trajectory(soc, request_kwargs["charger_power"], required)
+    within = step_start < window_s
+    kwh = step_kwh[within]
+
+    assert result["meets_departure"] == (completed and total_s <= window_s)
+    assert result["hours"] == pytest.approx(min(total_s, window_s) / 3600.0, abs=0.011)
+    assert result["final_battery"] == pytest.approx(soc + kwh.sum() / main.BATTERY_CAPACITY_KWH * 100.0, abs=0.11)
+    ref_cost = float(kwh @ _prices(_epoch(now) + step_start[within]))
+    assert result["cost_now"] == pytest.approx(ref_cost, abs=0.011)
+
+
+@pytest.mark.parametrize("now", NOWS)
+@pytest.mark.parametrize("request_kwargs", REQUESTS)
+def test_cheap_mode_matches_reference(monkeypatch, now, request_kwargs):
+    result = _plan(monkeypatch, now, cheap_mode=True, **request_kwargs)
+
+    soc = request_kwargs["battery_level"]
+    required = (request_kwargs["target_soc"] - soc) / 100.0 * main.BATTERY_CAPACITY_KWH
+    departure_s = _epoch(_departure(now, request_kwargs["target_time"]))
+    now_s = _epoch(now)
+    step_kwh, step_start, total_s, completed = _reference_trajectory(soc, request_kwargs["charger_power"], required)
+
+    # cost_now: charge immediately, no departure cutoff
+    assert result["cost_now"] == pytest.approx(float(step_kwh @ _prices(now_s + step_start)), abs=0.011)
+
+    # best plan over every quarter-hour start before departure
+    plans = []
+    for start_s in np.arange(now_s, departure_s, main.SLOT_INTERVAL * 3600.0):
+        within = step_start < departure_s - start_s
+        kwh = step_kwh[within]
+        done = completed and total_s <= departure_s - start_s
+        cost = float(kwh @ _prices(start_s + step_start[within]))
+        plans.append((done, soc + kwh.sum() / main.BATTERY_CAPACITY_KWH * 100.0, cost))
+
+    feasible = [cost for done, _, cost in plans if done]
+    assert result["meets_departure"] == bool(feasible)
+    if feasible:
+        assert result["cost_optimized"] == pytest.approx(min(feasible), abs=0.011)
+        assert result["final_battery"] == pytest.approx(request_kwargs["target_soc"], abs=0.11)
+    else:
+        best_soc = max(final_soc for _, final_soc, _ in plans)
+        assert result["final_battery"] == pytest.approx(best_soc, abs=0.11)
+        cheapest_at_best = min(cost for _, final_soc, cost in plans if final_soc >= best_soc - 0.05)
+        assert result["cost_optimized"] == pytest.approx(cheapest_at_best, abs=0.011)